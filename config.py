@@ -1,14 +1,31 @@
+from enum import Enum
+
 PORT = 8888
-BUFFER_SIZE = 32 * 1024
+BUFFER_SIZE = 1024 * 1024
 SERVER_TIMEOUT = 1.0
+DISCOVERY_PORT = 8889  # UDP port receivers answer discovery broadcasts on (None disables)
+DISCOVERY_TIMEOUT = 0.5  # Seconds the sender waits for receivers to answer
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024  # Kernel send/receive buffers; None keeps OS autotuning
+DIRECTORY_CONNECTIONS = 4  # Parallel connections used to send a directory (1 disables)
+WRITE_BUFFERS = 4  # Receive buffers in flight while a writer thread saves to disk (1 disables)
+
+# Files at least this large are sent with sendfile(2) where the OS provides it
+USE_SENDFILE = True
+ZEROCOPY_THRESHOLD = 64 * 1024
 
 RECEIVED_DIR = "received_files"
-HASH_CHUNK_SIZE = 8192
-HASH_ALGORITHM = "sha256"  # Can be 'sha256', 'md5', 'sha1', 'sha512', etc.
+HASH_CHUNK_SIZE = BUFFER_SIZE  # Same granularity as network I/O so one buffer serves both
+HASH_ALGORITHM = "sha256"  # Can be 'sha256', 'blake2b', 'blake3' (pip install blake3), 'sha512', etc.
+VERIFY_TRANSFERS = True  # False skips hashing on both ends and relies on TCP checksums (trusted LANs)
+
+PROGRESS_UPDATE_INTERVAL = 0.1
+
+
+class TransferType(str, Enum):
+    FILE = 'file'
+    DIRECTORY = 'directory'
+    DIRECTORY_PART = 'directory_part'  # Extra connection carrying files of a directory transfer
 
-PROGRESS_UPDATE_INTERVAL = 0.05
 
-TRANSFER_TYPES = {
-    'FILE': 'file',
-    'DIRECTORY': 'directory'
-}
\ No newline at end of file
+# Backward-compatible alias: TRANSFER_TYPES['FILE'] still resolves to TransferType.FILE
+TRANSFER_TYPES = TransferType
\ No newline at end of file
@@ -2,11 +2,23 @@ import curses
 import signal
 import threading
 from ui import CursesUI
-from network import get_all_network_interfaces, validate_ip
+from network import (get_all_network_interfaces, invalidate_interface_cache, validate_ip, describe_socket_tuning,
+                     discover_receivers)
 from sender import send_file, send_directory
 from receiver import start_server, stop_server
-from utils import clean_path
-from config import PORT
+from utils import clean_path, hash_acceleration_warning
+from config import PORT, SERVER_TIMEOUT, VERIFY_TRANSFERS
+
+
+# Main menu entries with their colors; transfer actions are highlighted
+MENU_ITEMS = (
+    ("1. 📤 Send File", 'highlight'),
+    ("2. 📁 Send Directory/Folder", 'highlight'),
+    ("3. 📥 Start Receiving Mode", 'highlight'),
+    ("4. 🔧 Change Network Settings", 'info'),
+    ("5. ❌ Exit", 'info'),
+)
+MENU_KEYS = [str(i) for i in range(1, len(MENU_ITEMS) + 1)]
 
 
 # ---- Global Signal Handling ----
@@ -16,6 +28,11 @@ def handle_sigint(signum, frame):
 signal.signal(signal.SIGINT, handle_sigint)
 
 
+def wake_main_thread():
+    """Interrupt a blocking getch() on the main thread, which then returns KEY_RESIZE"""
+    signal.pthread_kill(threading.main_thread().ident, signal.SIGWINCH)
+
+
 def main():
     def run_app(stdscr):
         ui = CursesUI()
@@ -24,7 +41,8 @@ def main():
         app_state = {
             'local_ip': None,
             'selected_interface_id': None,
-            'server_control': {'running': False, 'socket': None}
+            'server_control': {'running': False, 'socket': None},
+            'hash_warning': hash_acceleration_warning() if VERIFY_TRANSFERS else None
         }
 
         if not setup_direct_connection(ui, app_state):
@@ -59,30 +77,16 @@ def setup_direct_connection(ui, app_state):
         ui.print_colored(7, 4, "1. Make sure network cable/WiFi is connected", 'info')
         ui.print_colored(8, 4, "2. Check if network adapter is enabled", 'info')
         ui.print_colored(9, 4, "3. Try setting static IP manually", 'info')
-        return ip_setup(ui, app_state)
+        return ip_setup(ui, app_state, interfaces)
 
     # Display interfaces with color coding: description - adapter name - IP
     ui.print_colored(4, 2, f"🌐 Found {len(interfaces)} network interface(s):", 'success')
+    normal, warning, info, success = ui.c_normal, ui.c_warning, ui.c_info, ui.c_success
     for i, (description, adapter_name, ip, interface_id) in enumerate(interfaces, 1):
-        y_pos = 5 + i
-        x_pos = 4
-        
-        ui.stdscr.addstr(y_pos, x_pos, f"{i}. ")
-        x_pos += len(f"{i}. ")
-        
-        ui.stdscr.addstr(y_pos, x_pos, description, ui.colors['warning'])
-        x_pos += len(description)
-        
-        ui.stdscr.addstr(y_pos, x_pos, " - ")
-        x_pos += 3
-        
-        ui.stdscr.addstr(y_pos, x_pos, adapter_name, ui.colors['info'])
-        x_pos += len(adapter_name)
-        
-        ui.stdscr.addstr(y_pos, x_pos, " - ")
-        x_pos += 3
-        
-        ui.stdscr.addstr(y_pos, x_pos, ip, ui.colors['success'])
+        ui.draw_colored_segments(5 + i, 4, (
+            (f"{i}. ", normal), (description, warning), (" - ", normal),
+            (adapter_name, info), (" - ", normal), (ip, success)
+        ))
 
     while True:
         try:
@@ -101,33 +105,20 @@ def setup_direct_connection(ui, app_state):
             ui.show_message("Please select a valid number.", 'error', 1)
 
 
-def ip_setup(ui, app_state):
-    """Manual IP configuration helper"""
+def ip_setup(ui, app_state, all_interfaces=None):
+    """Manual IP configuration helper (reuses the caller's interface scan when given)"""
     ui.print_colored(12, 2, "🔧 Manual Setup Required", 'warning')
-    all_interfaces = get_all_network_interfaces()
+    if all_interfaces is None:
+        all_interfaces = get_all_network_interfaces()
 
     if all_interfaces:
         ui.print_colored(14, 2, f"📡 Found {len(all_interfaces)} interface(s) with IP addresses:", 'info')
+        normal, warning, info, success = ui.c_normal, ui.c_warning, ui.c_info, ui.c_success
         for i, (description, adapter_name, ip, interface_id) in enumerate(all_interfaces):
-            y_pos = 15 + i
-            x_pos = 4
-            
-            ui.stdscr.addstr(y_pos, x_pos, "- ")
-            x_pos += 2
-            
-            ui.stdscr.addstr(y_pos, x_pos, description, ui.colors['warning'])
-            x_pos += len(description)
-            
-            ui.stdscr.addstr(y_pos, x_pos, " - ")
-            x_pos += 3
-            
-            ui.stdscr.addstr(y_pos, x_pos, adapter_name, ui.colors['info'])
-            x_pos += len(adapter_name)
-            
-            ui.stdscr.addstr(y_pos, x_pos, ": ")
-            x_pos += 2
-            
-            ui.stdscr.addstr(y_pos, x_pos, ip, ui.colors['success'])
+            ui.draw_colored_segments(15 + i, 4, (
+                ("- ", normal), (description, warning), (" - ", normal),
+                (adapter_name, info), (": ", normal), (ip, success)
+            ))
 
         ui.print_colored(17 + len(all_interfaces), 2, "💡 You can manually specify an IP from above, or set a custom one", 'info')
 
@@ -147,7 +138,7 @@ def main_menu(ui, app_state):
     """Main application menu"""
     while True:
         ui.draw_header("🔗 Tetherfile - File Transfer Utility")
-        ui.print_colored(ui.height - 2, 0, "═" * (ui.width - 1), 'highlight')
+        ui.draw_rule(ui.height - 2)
 
         if app_state['local_ip']:
             ui.print_colored(4, 2, f"📱 LOCAL IP: {app_state['local_ip']}", 'success')
@@ -156,22 +147,15 @@ def main_menu(ui, app_state):
         box_y = 6
         ui.draw_box(box_y, 2, box_height, ui.width - 4, "📋 MAIN MENU")
 
-        menu_items = [
-            "1. 📤 Send File",
-            "2. 📁 Send Directory/Folder",
-            "3. 📥 Start Receiving Mode",
-            "4. 🔧 Change Network Settings",
-            "5. ❌ Exit"
-        ]
-
-        for i, item in enumerate(menu_items):
-            color = 'highlight' if i < 3 else 'info'
+        for i, (item, color) in enumerate(MENU_ITEMS):
             ui.print_colored(box_y + 2 + i, 4, item, color)
 
-        ui.stdscr.refresh()
+        if app_state['hash_warning']:
+            ui.print_colored(box_y + box_height + 3, 2, f"⚠️ {app_state['hash_warning']} (see HASH_ALGORITHM / VERIFY_TRANSFERS)", 'warning')
 
+        # get_single_key flushes the whole menu to the terminal in one update
         try:
-            choice = ui.get_single_key(box_y + box_height + 1, 2, "Select option (1-5)", ['1', '2', '3', '4', '5'])
+            choice = ui.get_single_key(box_y + box_height + 1, 2, "Select option (1-5)", MENU_KEYS)
 
             if choice == '1':
                 send_file_menu(ui, app_state)
@@ -180,6 +164,8 @@ def main_menu(ui, app_state):
             elif choice == '3':
                 receive_mode(ui, app_state)
             elif choice == '4':
+                # The user may have just plugged in a cable, so rescan
+                invalidate_interface_cache()
                 if setup_direct_connection(ui, app_state):
                     ui.show_message(f"✅ Updated IP: {app_state['local_ip']}", 'success')
             elif choice == '5':
@@ -193,16 +179,33 @@ def main_menu(ui, app_state):
             raise   # bubble up to wrapper
 
 
-def get_target_ip(ui):
-    """Get target IP from user"""
-    ui.stdscr.erase()
-    ui.stdscr.clear()
+def get_target_ip(ui, app_state):
+    """Get target IP from user, offering receivers that answer a discovery broadcast"""
     ui.draw_header("🎯 Target Selection")
     ui.print_colored(4, 2, "Enter the IP address of the target device:", 'info')
     ui.print_colored(5, 2, "Make sure the other device is running this program in receive mode.", 'warning')
+    ui.print_colored(7, 2, "📡 Looking for receivers...", 'info')
+    ui.frame_end()
+
+    # Leave room on screen for the prompt below the list
+    receivers = discover_receivers(app_state['local_ip'])[:max(0, ui.height - 13)]
+    ui.stdscr.move(7, 0)
+    ui.stdscr.clrtoeol()
+    if receivers:
+        ui.print_colored(7, 2, f"📡 Found {len(receivers)} receiver(s):", 'success')
+        for i, ip in enumerate(receivers, 1):
+            ui.print_colored(7 + i, 4, f"{i}. {ip}", 'info')
+        prompt_y = 9 + len(receivers)
+        prompt = "🌐 Target IP or number: "
+    else:
+        ui.print_colored(7, 2, "📡 No receivers answered; enter the IP manually.", 'warning')
+        prompt_y = 9
+        prompt = "🌐 Target IP: "
 
     while True:
-        target_ip = ui.get_input(7, 2, "🌐 Target IP: ")
+        target_ip = ui.get_input(prompt_y, 2, prompt).strip()
+        if target_ip.isdigit() and 1 <= int(target_ip) <= len(receivers):
+            return receivers[int(target_ip) - 1]
         if validate_ip(target_ip):
             return target_ip
         else:
@@ -210,12 +213,10 @@ def get_target_ip(ui):
 
 
 def send_file_menu(ui, app_state):
-    target_ip = get_target_ip(ui)
+    target_ip = get_target_ip(ui, app_state)
     if not target_ip:
         return
 
-    ui.stdscr.erase()
-    ui.stdscr.clear()
     ui.draw_header("📤 Send File")
     ui.print_colored(4, 2, f"🎯 Target: {target_ip}", 'success')
 
@@ -226,20 +227,14 @@ def send_file_menu(ui, app_state):
         send_file(file_path, target_ip, PORT, app_state['local_ip'], ui)
 
     ui.print_colored(ui.height - 3, 2, "Press any key to continue...", 'highlight')
-    ui.stdscr.refresh()
-    ui.stdscr.getch()
-    ui.stdscr.erase()
-    ui.stdscr.clear()
-    ui.stdscr.refresh()
+    ui.stdscr.getch()  # getch() refreshes the window itself
 
 
 def send_directory_menu(ui, app_state):
-    target_ip = get_target_ip(ui)
+    target_ip = get_target_ip(ui, app_state)
     if not target_ip:
         return
 
-    ui.stdscr.erase()
-    ui.stdscr.clear()
     ui.draw_header("📁 Send Directory")
     ui.print_colored(4, 2, f"🎯 Target: {target_ip}", 'success')
 
@@ -250,11 +245,21 @@ def send_directory_menu(ui, app_state):
         send_directory(dir_path, target_ip, PORT, app_state['local_ip'], ui)
 
     ui.print_colored(ui.height - 3, 2, "Press any key to continue...", 'highlight')
-    ui.stdscr.refresh()
-    ui.stdscr.getch()
-    ui.stdscr.erase()
-    ui.stdscr.clear()
-    ui.stdscr.refresh()
+    ui.stdscr.getch()  # getch() refreshes the window itself
+
+
+def draw_receive_screen(ui, app_state, status):
+    """Draw the receive mode screen with the given status line"""
+    ui.draw_header("📥 Receive Mode Active")
+    ui.print_colored(4, 2, f"🎯 Listening on {app_state['local_ip']}:{PORT}", 'info')
+    ui.print_colored(5, 2, "💾 Files will be saved in the 'received_files' folder.", 'info')
+    ui.print_colored(6, 2, "🔗 Ensure sender uses this IP to connect.", 'warning')
+    # A stopped server leaves its closed socket behind
+    server_control = app_state['server_control']
+    if server_control['running'] and server_control['socket']:
+        ui.print_colored(7, 2, f"⚙️ Socket: {describe_socket_tuning(server_control['socket'])}", 'info')
+    ui.print_colored(8, 2, status, 'highlight')
+    ui.frame_end()
 
 
 def receive_mode(ui, app_state):
@@ -262,15 +267,16 @@ def receive_mode(ui, app_state):
     if app_state['server_control']['running']:
         stop_server(app_state['server_control'])
     
-    ui.stdscr.erase()
-    ui.stdscr.clear()
-    ui.draw_header("📥 Receive Mode Active")
-    ui.print_colored(4, 2, f"🎯 Listening on {app_state['local_ip']}:{PORT}", 'info')
-    ui.print_colored(5, 2, "💾 Files will be saved in the 'received_files' folder.", 'info')
-    ui.print_colored(6, 2, "🔗 Ensure sender uses this IP to connect.", 'warning')
-    ui.print_colored(8, 2, "🔛 Starting server... Press 'Q' to stop.", 'highlight')
-    ui.stdscr.refresh()
+    draw_receive_screen(ui, app_state, "🔛 Starting server... Press 'Q' to stop.")
+
+    # Block on the keyboard instead of polling it; the server wakes this
+    # thread if it stops on its own. Without pthread_kill (Windows), fall
+    # back to checking the server once per SERVER_TIMEOUT.
+    can_wake = hasattr(signal, 'pthread_kill') and hasattr(signal, 'SIGWINCH')
+    if can_wake:
+        app_state['server_control']['wake'] = wake_main_thread
 
+    started = app_state['server_control']['started'] = threading.Event()
     server_thread = threading.Thread(
         target=start_server,
         args=(app_state['local_ip'], PORT, ui, app_state['server_control']),
@@ -278,46 +284,39 @@ def receive_mode(ui, app_state):
     )
     server_thread.start()
 
-    import time
-    time.sleep(0.5)
+    # Continue as soon as the server is listening or has given up,
+    # rather than after a fixed delay
+    started.wait(5)
     
     if not app_state['server_control']['running']:
         ui.show_message("❌ Failed to start server", 'error')
         return
 
     try:
+        poll_timeout = -1 if can_wake else int(SERVER_TIMEOUT * 1000)
         while app_state['server_control']['running']:
-            ui.stdscr.timeout(100)
-            key = ui.stdscr.getch()
+            key = ui.poll_key(poll_timeout)
             
             if key in (ord('q'), ord('Q')):
                 break
-            elif key == curses.KEY_RESIZE:
-                ui.height, ui.width = ui.stdscr.getmaxyx()
-                ui.stdscr.erase()
+            elif key == curses.KEY_RESIZE and app_state['server_control']['running']:
+                ui.handle_resize()
+                # Resizing is the one case that needs a full repaint
                 ui.stdscr.clear()
-                ui.draw_header("📥 Receive Mode Active")
-                ui.print_colored(4, 2, f"🎯 Listening on {app_state['local_ip']}:{PORT}", 'info')
-                ui.print_colored(5, 2, "💾 Files will be saved in the 'received_files' folder.", 'info')
-                ui.print_colored(6, 2, "🔗 Ensure sender uses this IP to connect.", 'warning')
-                ui.print_colored(8, 2, "🔛 Server running... Press 'Q' to stop.", 'highlight')
-                ui.stdscr.refresh()
+                draw_receive_screen(ui, app_state, "🔛 Server running... Press 'Q' to stop.")
             
     except KeyboardInterrupt:
         raise
     finally:
+        # Stopping on request needs no wake-up signal
+        app_state['server_control'].pop('wake', None)
         stop_server(app_state['server_control'])
         
-        ui.stdscr.timeout(10)
-        while ui.stdscr.getch() != -1:
-            pass
+        # Discard keys pressed while receiving so they do not leak into the menu
         ui.stdscr.timeout(-1)
+        curses.flushinp()
 
     ui.show_message("🛑 Receive mode stopped.", 'warning')
-    time.sleep(1)
-    ui.stdscr.erase()
-    ui.stdscr.clear()
-    ui.stdscr.refresh()
 
 
 if __name__ == "__main__":
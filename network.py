@@ -1,22 +1,60 @@
 import socket
+import ipaddress
 import platform
 import subprocess
 import json
+import re
+import struct
 import sys
+import time
+from functools import lru_cache
+from importlib.util import find_spec
+from config import SOCKET_BUFFER_SIZE, DISCOVERY_PORT, DISCOVERY_TIMEOUT
+from utils import format_size
 
-try:
-    import psutil
-except ImportError:
+# Only check that psutil is installed here; it is imported on first use so
+# startup does not pay for loading its extension module
+if find_spec('psutil') is None:
     print("❌ Missing dependency: psutil")
     print("📦 Install with: pip install psutil")
     sys.exit(1)
 
 
+# Adapters rarely change while the app runs, so a scan is reused until it
+# expires or the user asks for a fresh one
+INTERFACE_CACHE_TTL = 30.0
+_interface_cache = {'time': 0.0, 'interfaces': None}
+
+
 def get_all_network_interfaces():
     """
     Get all network interfaces with IP addresses across all platforms.
     Returns list of tuples: (description, adapter_name, ip_address, interface_id)
     """
+    now = time.monotonic()
+    if _interface_cache['interfaces'] is not None and now - _interface_cache['time'] < INTERFACE_CACHE_TTL:
+        return list(_interface_cache['interfaces'])
+
+    interfaces = _scan_network_interfaces()
+    # An empty result may be a cable still coming up, so scan again next time
+    if interfaces:
+        _interface_cache['time'] = now
+        _interface_cache['interfaces'] = interfaces
+    return list(interfaces)
+
+
+def invalidate_interface_cache():
+    """Forget cached interfaces and descriptions so the next lookup rescans the system"""
+    _interface_cache['interfaces'] = None
+    get_interface_description.cache_clear()
+    _get_windows_adapter_descriptions.cache_clear()
+    _get_macos_hardware_ports.cache_clear()
+
+
+def _scan_network_interfaces():
+    """Query psutil for IPv4 interfaces that are up (see get_all_network_interfaces)"""
+    import psutil
+
     interfaces = []
     
     try:
@@ -57,9 +95,11 @@ def get_all_network_interfaces():
     return interfaces
 
 
+@lru_cache(maxsize=None)
 def get_interface_description(interface_name):
     """
     Get human-readable description for network interface based on platform
+    (cached, since platform lookups may spawn a subprocess)
     """
     system = platform.system().lower()
     
@@ -76,40 +116,70 @@ def get_interface_description(interface_name):
         return _get_generic_interface_description(interface_name)
 
 
-def _get_windows_interface_description(interface_name):
-    """Get Windows-specific interface description"""
+@lru_cache(maxsize=1)
+def _get_windows_adapter_descriptions():
+    """Map every adapter name to its InterfaceDescription with one PowerShell call"""
+    descriptions = {}
     try:
-        # Try to get detailed info using PowerShell
-        cmd = f'powershell "Get-NetAdapter -Name \\"{interface_name}\\" | Select-Object InterfaceDescription | ConvertTo-Json"'
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=3)
-        
+        # Started directly rather than through cmd.exe, and without loading
+        # the user's profile scripts, which often dominate PowerShell startup
+        cmd = ['powershell', '-NoProfile', '-NonInteractive', '-Command',
+               'Get-NetAdapter | Select-Object Name,InterfaceDescription | ConvertTo-Json -Compress']
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+
         if result.returncode == 0 and result.stdout.strip():
             data = json.loads(result.stdout.strip())
-            desc = data.get('InterfaceDescription', '')
-            if desc:
-                return _categorize_interface(desc, interface_name)
+            # ConvertTo-Json emits a bare object when there is only one adapter
+            if isinstance(data, dict):
+                data = [data]
+            for adapter in data:
+                if adapter.get('Name'):
+                    descriptions[adapter['Name']] = adapter.get('InterfaceDescription') or ''
     except Exception:
         pass
-    
+
+    return descriptions
+
+
+def _get_windows_interface_description(interface_name):
+    """Get Windows-specific interface description"""
+    desc = _get_windows_adapter_descriptions().get(interface_name, '')
+    if desc:
+        return _categorize_interface(desc, interface_name)
+
     return _get_generic_interface_description(interface_name)
 
 
-def _get_macos_interface_description(interface_name):
-    """Get macOS-specific interface description"""
+@lru_cache(maxsize=1)
+def _get_macos_hardware_ports():
+    """Map every device (e.g. en0) to its hardware port name with one networksetup call"""
+    ports = {}
     try:
-        # Try to get interface info using networksetup
-        cmd = f"networksetup -listallhardwareports | grep -A 1 '{interface_name}'"
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=3)
-        
-        if result.returncode == 0 and result.stdout.strip():
-            lines = result.stdout.strip().split('\n')
-            for line in lines:
-                if 'Hardware Port:' in line:
-                    desc = line.split('Hardware Port:')[1].strip()
-                    return _categorize_interface(desc, interface_name)
+        result = subprocess.run(['networksetup', '-listallhardwareports'],
+                                capture_output=True, text=True, timeout=3)
+
+        if result.returncode == 0:
+            # Output is blocks of "Hardware Port: Wi-Fi" followed by "Device: en0"
+            port = None
+            for line in result.stdout.splitlines():
+                key, _, value = line.partition(':')
+                if key == 'Hardware Port':
+                    port = value.strip()
+                elif key == 'Device' and port:
+                    ports[value.strip()] = port
+                    port = None
     except Exception:
         pass
-    
+
+    return ports
+
+
+def _get_macos_interface_description(interface_name):
+    """Get macOS-specific interface description"""
+    desc = _get_macos_hardware_ports().get(interface_name, '')
+    if desc:
+        return _categorize_interface(desc, interface_name)
+
     return _get_generic_interface_description(interface_name)
 
 
@@ -147,44 +217,37 @@ def _get_generic_interface_description(interface_name):
     return _categorize_interface("", interface_name)
 
 
+# Interface categories in priority order, each with the substrings that
+# identify it in an adapter's name or description
+INTERFACE_CATEGORIES = (
+    ("📶 WiFi Network", ('wifi', 'wireless', 'wlan', '802.11', 'wi-fi', 'wl', 'ath', 'iwl', 'rtl8188', 'rtl8192', 'bcm')),
+    ("🔌 Ethernet Network", ('ethernet', 'eth', 'en', 'lan', 'realtek', 'intel', 'broadcom', 'e1000', 'rtl8139', 'rtl8169')),
+    ("🔌 USB Network", ('usb', 'rndis', 'cdc_ether')),
+    ("💻 Virtual Network", ('virtual', 'vmware', 'virtualbox', 'vbox', 'hyper-v', 'tap', 'tun', 'bridge', 'docker', 'veth')),
+    ("📱 Bluetooth Network", ('bluetooth', 'bnep', 'bt')),
+    ("📱 Mobile Network", ('mobile', 'cellular', '3g', '4g', '5g', 'lte', 'wwan', 'ppp')),
+)
+
+# One compiled alternation per category scans for all of its indicators at once
+_CATEGORY_PATTERNS = tuple(
+    (re.compile('|'.join(map(re.escape, indicators))), label)
+    for label, indicators in INTERFACE_CATEGORIES
+)
+
+
 def _categorize_interface(description, interface_name):
     """
     Categorize interface type based on description and name
     Returns a user-friendly description
     """
     name_lower = interface_name.lower()
-    desc_lower = description.lower()
-    
-    # WiFi/Wireless indicators
-    wifi_indicators = ['wifi', 'wireless', 'wlan', '802.11', 'wi-fi', 'wl', 'ath', 'iwl', 'rtl8188', 'rtl8192', 'bcm']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in wifi_indicators):
-        return "📶 WiFi Network"
-    
-    # Ethernet indicators
-    ethernet_indicators = ['ethernet', 'eth', 'en', 'lan', 'realtek', 'intel', 'broadcom', 'e1000', 'rtl8139', 'rtl8169']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in ethernet_indicators):
-        return "🔌 Ethernet Network"
-    
-    # USB indicators
-    usb_indicators = ['usb', 'rndis', 'cdc_ether']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in usb_indicators):
-        return "🔌 USB Network"
-    
-    # Virtual/Tunnel indicators
-    virtual_indicators = ['virtual', 'vmware', 'virtualbox', 'vbox', 'hyper-v', 'tap', 'tun', 'bridge', 'docker', 'veth']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in virtual_indicators):
-        return "💻 Virtual Network"
-    
-    # Bluetooth indicators
-    bluetooth_indicators = ['bluetooth', 'bnep', 'bt']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in bluetooth_indicators):
-        return "📱 Bluetooth Network"
-    
-    # Mobile/Cellular indicators
-    mobile_indicators = ['mobile', 'cellular', '3g', '4g', '5g', 'lte', 'wwan', 'ppp']
-    if any(indicator in name_lower or indicator in desc_lower for indicator in mobile_indicators):
-        return "📱 Mobile Network"
-    
+    # The separator keeps a match from spanning the name and the description
+    haystack = f"{name_lower}\0{description.lower()}"
+
+    for pattern, label in _CATEGORY_PATTERNS:
+        if pattern.search(haystack):
+            return label
+
     # Default based on common interface naming patterns
     if name_lower.startswith(('eth', 'en')):
         return "🔌 Ethernet Network"
@@ -220,17 +283,134 @@ def get_interface_name(interface_id):
 
 
 def validate_ip(ip):
-    """Validate IP address format"""
+    """Validate IP address format (IPv4 only, as transfer sockets are AF_INET)"""
     try:
-        parts = ip.split('.')
-        return len(parts) == 4 and all(0 <= int(part) <= 255 for part in parts)
-    except:
+        ipaddress.IPv4Address(ip)
+        return True
+    except ValueError:
         return False
 
 
+# UDP probe a sender broadcasts and the answer receivers in receive mode send back
+DISCOVERY_REQUEST = b'TETHERFILE?DISCOVER'
+DISCOVERY_REPLY = b'TETHERFILE?HERE'
+
+
+def get_broadcast_address(local_ip):
+    """Broadcast address of the interface that owns local_ip (limited broadcast if unknown)"""
+    import psutil
+
+    try:
+        for addr_list in psutil.net_if_addrs().values():
+            for addr in addr_list:
+                if addr.family != socket.AF_INET or addr.address != local_ip:
+                    continue
+                if addr.broadcast:
+                    return addr.broadcast
+                if addr.netmask:
+                    network = ipaddress.IPv4Network(f"{local_ip}/{addr.netmask}", strict=False)
+                    return str(network.broadcast_address)
+    except Exception:
+        pass
+    return '255.255.255.255'
+
+
+def create_discovery_socket():
+    """Bind the UDP socket a receiver answers discovery probes on (None if unavailable)"""
+    if not DISCOVERY_PORT:
+        return None
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Broadcasts only reach sockets bound to the wildcard address
+        sock.bind(('', DISCOVERY_PORT))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def answer_discovery(sock):
+    """Reply to one pending discovery probe"""
+    try:
+        data, addr = sock.recvfrom(64)
+        if data == DISCOVERY_REQUEST:
+            sock.sendto(DISCOVERY_REPLY, addr)
+    except OSError:
+        pass
+
+
+def discover_receivers(local_ip, timeout=DISCOVERY_TIMEOUT):
+    """Broadcast one discovery probe and return the IPs of receivers that answer"""
+    if not DISCOVERY_PORT:
+        return []
+
+    receivers = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if local_ip:
+            sock.bind((local_ip, 0))
+        sock.sendto(DISCOVERY_REQUEST, (get_broadcast_address(local_ip), DISCOVERY_PORT))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, addr = sock.recvfrom(64)
+            except socket.timeout:
+                break
+            if data == DISCOVERY_REPLY and addr[0] != local_ip and addr[0] not in receivers:
+                receivers.append(addr[0])
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+    return receivers
+
+
+def configure_transfer_socket(sock):
+    """Apply buffer sizes and TCP options for bulk transfers"""
+    # Must happen before connect/listen so window scaling is negotiated for it
+    if SOCKET_BUFFER_SIZE:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    # Metadata and acknowledgments are small writes that should not wait on Nagle
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def describe_socket_tuning(sock):
+    """Summarize the buffer sizes and TCP options the kernel actually applied to a socket"""
+    try:
+        send_buffer = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        recv_buffer = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        nodelay = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    except OSError:
+        return "socket options unavailable"
+    # Linux reports twice the requested size and caps it at net.core.[rw]mem_max
+    return (f"send {format_size(send_buffer)}, receive {format_size(recv_buffer)}, "
+            f"TCP_NODELAY {'on' if nodelay else 'off'}")
+
+
+def enable_quickack(sock):
+    """Ask Linux to acknowledge incoming segments immediately instead of delaying ACKs"""
+    # The kernel drops back to delayed ACKs on its own, so callers re-arm
+    # this at points where the sender is waiting (e.g. between files)
+    if hasattr(socket, 'TCP_QUICKACK'):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        except OSError:
+            pass
+
+
 def create_socket(local_ip=None):
     """Create and configure a socket"""
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    configure_transfer_socket(sock)
     if local_ip:
         sock.bind((local_ip, 0))
     return sock
@@ -240,10 +420,65 @@ def create_server_socket(local_ip, port):
     """Create and configure a server socket"""
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Accepted client sockets inherit these settings
+    configure_transfer_socket(server_socket)
     
     if local_ip:
         server_socket.bind((local_ip, port))
     else:
         server_socket.bind(('', port))
     
-    return server_socket
\ No newline at end of file
+    return server_socket
+
+
+def recv_exact(sock, size):
+    """Receive exactly 'size' bytes from socket as bytes-like data (None if it closes first)"""
+    # Small control messages nearly always arrive in one piece
+    data = sock.recv(size)
+    if len(data) == size or not data:
+        return data or None
+
+    # Otherwise fill one preallocated buffer instead of concatenating pieces
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = len(data)
+    view[:received] = data
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if not n:
+            return None
+        received += n
+    # Callers only compare, unpack, decode or parse the result, all of which
+    # accept a bytearray, so skip copying it into bytes
+    return buffer
+
+
+# Length prefix in front of every connection's JSON metadata
+METADATA_LENGTH = struct.Struct('!I')
+
+# Each file of a directory stream is preceded by its path length (u16) and
+# size (u64) followed by the UTF-8 path; an empty path ends the stream
+FILE_HEADER = struct.Struct('!HQ')
+END_OF_FILES = FILE_HEADER.pack(0, 0)
+
+
+def pack_file_header(path, size):
+    """Build the header that precedes a file in a directory stream"""
+    path_bytes = path.encode('utf-8')
+    return FILE_HEADER.pack(len(path_bytes), size) + path_bytes
+
+
+def recv_file_header(sock):
+    """Read a directory stream file header; returns {'path', 'size'} or None at the end"""
+    header = recv_exact(sock, FILE_HEADER.size)
+    if header is None:
+        raise Exception("Connection lost during directory transfer")
+
+    path_length, size = FILE_HEADER.unpack(header)
+    if not path_length:
+        return None
+
+    path_bytes = recv_exact(sock, path_length)
+    if path_bytes is None:
+        raise Exception("Connection lost during directory transfer")
+    return {'path': path_bytes.decode('utf-8'), 'size': size}
@@ -1,25 +1,59 @@
 import time
 from datetime import timedelta
 from utils import format_size
+from config import BUFFER_SIZE, PROGRESS_UPDATE_INTERVAL
+
+# Redraw interval in integer nanoseconds, compared against time.monotonic_ns()
+UPDATE_INTERVAL_NS = int(PROGRESS_UPDATE_INTERVAL * 1_000_000_000)
+
+
+def changed_span(old, new):
+    """Return (start, end) of the run of characters that differ between two lines"""
+    width = max(len(old), len(new))
+    old = old.ljust(width)
+    new = new.ljust(width)
+
+    start = 0
+    while start < width and old[start] == new[start]:
+        start += 1
+    end = width
+    while end > start and old[end - 1] == new[end - 1]:
+        end -= 1
+    return start, end
+
 
 class ProgressTracker:
     def __init__(self, total, description="Progress", ui=None):
         self.total = total
         self.current = 0
         self.description = description
-        self.start_time = time.time()
-        self.last_update = 0
+        self.start_ns = time.monotonic_ns()
+        self.last_update_ns = 0
+        # Bytes that must move before the clock is even checked: one step of
+        # the bar's 0.1% resolution, bounded so slow links still refresh
+        self.min_step = min(max(total // 1000, 64 * 1024), BUFFER_SIZE)
+        self.last_bytes = 0
         self.ui = ui
         self.completed = False
+        self.total_str = format_size(total)
+        # Last rendered content per progress row, so unchanged rows are not redrawn;
+        # bar_y and bar_width only change with the terminal size (the frame)
+        self._frame = None
+        self.bar_y = 0
+        self.bar_width = 0
+        self._drawn = {}
 
     def update(self, current):
         self.current = current
-        now = time.time()
-        
-        if now - self.last_update < 0.05 and current < self.total:
+        if current - self.last_bytes < self.min_step and current < self.total:
             return
-            
-        self.last_update = now
+        now = time.monotonic_ns()
+
+        if now - self.last_update_ns < UPDATE_INTERVAL_NS and current < self.total:
+            return
+
+        self.last_update_ns = now
+        self.last_bytes = current
         
         if self.ui and self.ui.stdscr:
             self.draw_progress()
@@ -33,40 +67,60 @@ class ProgressTracker:
             
         try:
             progress = self.current / self.total if self.total > 0 else 0
-            elapsed = time.time() - self.start_time
+            elapsed = (time.monotonic_ns() - self.start_ns) / 1_000_000_000
             
             if elapsed > 0 and self.current > 0:
                 speed = self.current / elapsed
                 eta_seconds = (self.total - self.current) / speed if speed > 0 else float('inf')
                 eta = str(timedelta(seconds=int(eta_seconds)))
-                
-                if speed > 1024*1024:
-                    speed_str = f"{speed/(1024*1024):.1f} MB/s"
-                elif speed > 1024:
-                    speed_str = f"{speed/1024:.1f} KB/s"
-                else:
-                    speed_str = f"{speed:.1f} B/s"
+                # Same unit table as the sizes, which also covers GB/s links
+                speed_str = format_size(speed) + "/s"
             else:
                 speed_str = "0 B/s"
                 eta = "∞"
             
             current_str = format_size(self.current)
-            total_str = format_size(self.total)
-            
-            bar_width = min(60, self.ui.width - 20)
-            bar_y = self.ui.height // 2
-            
-            for i in range(5):
-                self.ui.stdscr.move(bar_y - 2 + i, 0)
-                self.ui.stdscr.clrtoeol()
-            
-            self.ui.print_colored(bar_y - 2, 2, self.description, 'highlight')
-            self.ui.draw_progress_bar(bar_y, 2, bar_width, progress, '', 'success')
-            
-            stats = f"{current_str}/{total_str} | {speed_str} | ETA: {eta}"
-            self.ui.print_colored(bar_y + 1, 2, stats, 'info')
-            
-            self.ui.stdscr.refresh()
+
+            # Lay out and clear the progress area only on first draw or after a resize
+            frame = (self.ui.height, self.ui.width)
+            if frame != self._frame:
+                self.bar_width = min(60, self.ui.width - 20)
+                self.bar_y = self.ui.height // 2
+                for i in range(5):
+                    self.ui.stdscr.move(self.bar_y - 2 + i, 0)
+                    self.ui.stdscr.clrtoeol()
+                self._frame = frame
+                self._drawn = {}
+
+            bar_y = self.bar_y
+            bar_width = self.bar_width
+            drawn = self._drawn
+            changed = False
+
+            if drawn.get('description') != self.description:
+                self.ui.print_attr(bar_y - 2, 2, self.description, self.ui.c_highlight)
+                drawn['description'] = self.description
+                changed = True
+
+            bar_key = (int(progress * (bar_width - 2)), int(progress * 1000))
+            if drawn.get('bar') != bar_key:
+                self.ui.draw_progress_bar(bar_y, 2, bar_width, progress, '', 'success')
+                drawn['bar'] = bar_key
+                changed = True
+
+            stats = f"{current_str}/{self.total_str} | {speed_str} | ETA: {eta}"
+            previous = drawn.get('stats', '')
+            if previous != stats:
+                # Rewrite only the cells that changed, padding over leftovers
+                # from a longer previous line
+                start, end = changed_span(previous, stats)
+                padded = stats.ljust(len(previous))
+                self.ui.print_attr(bar_y + 1, 2 + start, padded[start:end], self.ui.c_info)
+                drawn['stats'] = stats
+                changed = True
+
+            if changed:
+                self.ui.stdscr.refresh()
             
         except Exception:
             pass
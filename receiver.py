@@ -1,12 +1,20 @@
 import socket
 import json
-import struct
+import queue
+import selectors
 import threading
+import time
 import os
-from network import create_server_socket
-from utils import calculate_file_hash, ensure_directory, format_size
+from network import (create_server_socket, create_discovery_socket, answer_discovery, configure_transfer_socket,
+                     describe_socket_tuning, enable_quickack, recv_exact, recv_file_header, METADATA_LENGTH)
+from utils import create_hasher, ensure_directory, format_size, open_output_file, preallocate_file
 from progress import ProgressTracker
-from config import BUFFER_SIZE, SERVER_TIMEOUT, RECEIVED_DIR, TRANSFER_TYPES
+from config import BUFFER_SIZE, WRITE_BUFFERS, RECEIVED_DIR, HASH_ALGORITHM, TransferType
+
+
+# Directory transfers that are accepting extra parallel connections, by transfer id
+parallel_transfers = {}
+parallel_transfers_lock = threading.Lock()
 
 
 def start_server(local_ip, port, ui, server_control):
@@ -15,23 +23,51 @@ def start_server(local_ip, port, ui, server_control):
     try:
         server_socket = create_server_socket(local_ip, port)
         server_socket.listen(5)
-        server_control['running'] = True
-        server_control['socket'] = server_socket
+        failed_validations = []
 
-        ui.stdscr.clear()
-        ui.draw_header("📥 Receive Mode Active")
-        ui.print_colored(4, 2, f"🎯 Server listening on {local_ip or 'all interfaces'}:{port}", 'success')
-        ui.print_colored(5, 2, f"💾 Files will be saved in '{RECEIVED_DIR}' directory", 'info')
-        ui.print_colored(6, 2, "🔗 Other laptop should use this IP as target", 'info')
-        ui.print_colored(8, 2, "💡 Ready to receive files... (Press 'q' to stop)", 'highlight')
-        ui.stdscr.refresh()
+        # Sleep in the selector until a client connects or stop_server writes
+        # to the wake-up socket, instead of waking periodically to poll
+        server_socket.setblocking(False)
+        wake_reader, server_control['stop_signal'] = socket.socketpair()
+        selector = selectors.DefaultSelector()
+        selector.register(server_socket, selectors.EVENT_READ)
+        selector.register(wake_reader, selectors.EVENT_READ)
+        # Senders find this receiver with a UDP broadcast instead of typing its IP
+        discovery_socket = create_discovery_socket()
+        if discovery_socket:
+            selector.register(discovery_socket, selectors.EVENT_READ)
 
-        failed_validations = []
+        try:
+            server_control['running'] = True
+            server_control['socket'] = server_socket
+
+            ui.draw_header("📥 Receive Mode Active")
+            ui.print_colored(4, 2, f"🎯 Server listening on {local_ip or 'all interfaces'}:{port}", 'success')
+            ui.print_colored(5, 2, f"💾 Files will be saved in '{RECEIVED_DIR}' directory", 'info')
+            ui.print_colored(6, 2, "🔗 Other laptop should use this IP as target", 'info')
+            ui.print_colored(7, 2, f"⚙️ Socket: {describe_socket_tuning(server_socket)}", 'info')
+            ui.print_colored(8, 2, "💡 Ready to receive files... (Press 'q' to stop)", 'highlight')
+            ui.stdscr.refresh()
+            # Only now can stop_server wake the loop, so callers may stop us
+            _signal_started(server_control)
+
+            while server_control['running']:
+                try:
+                    ready = {key.fileobj for key, _ in selector.select()}
+                    if wake_reader in ready:
+                        break
+                    if discovery_socket in ready:
+                        answer_discovery(discovery_socket)
+                    if server_socket not in ready:
+                        continue
+                    client_socket, addr = server_socket.accept()
+                except BlockingIOError:
+                    continue
+                except (OSError, ValueError):
+                    if server_control['running']:
+                        ui.show_message("❌ Server error occurred", 'error')
+                    break
 
-        while server_control['running']:
-            try:
-                server_socket.settimeout(SERVER_TIMEOUT)
-                client_socket, addr = server_socket.accept()
                 ui.print_colored(10, 2, f"📥 Connection from {addr[0]}", 'success')
                 ui.stdscr.refresh()
 
@@ -42,13 +78,12 @@ def start_server(local_ip, port, ui, server_control):
                     daemon=True
                 )
                 thread.start()
-
-            except socket.timeout:
-                continue
-            except socket.error:
-                if server_control['running']:
-                    ui.show_message("❌ Server error occurred", 'error')
-                break
+        finally:
+            selector.close()
+            server_control.pop('stop_signal').close()
+            wake_reader.close()
+            if discovery_socket:
+                discovery_socket.close()
 
         # Show validation summary if there were failures
         if failed_validations:
@@ -62,11 +97,30 @@ def start_server(local_ip, port, ui, server_control):
                 server_socket.close()
             except:
                 pass
+        # Let a UI waiting on the keyboard notice that the server stopped
+        server_control['running'] = False
+        _signal_started(server_control)
+        wake = server_control.get('wake')
+        if wake:
+            wake()
+
+
+def _signal_started(server_control):
+    """Release a caller waiting for the server to start listening (or fail to)"""
+    started = server_control.get('started')
+    if started:
+        started.set()
 
 
 def stop_server(server_control):
     """Stop the server"""
     server_control['running'] = False
+    stop_signal = server_control.get('stop_signal')
+    if stop_signal:
+        try:
+            stop_signal.send(b'\0')
+        except OSError:
+            pass
     if server_control.get('socket'):
         try:
             server_control['socket'].close()
@@ -78,13 +132,16 @@ def handle_client(client_socket, ui, failed_validations):
     """Handle incoming file transfer"""
     try:
         client_socket.settimeout(60)  # Set timeout for client operations
+        # Not every platform copies socket options from the listening socket
+        configure_transfer_socket(client_socket)
+        enable_quickack(client_socket)
         
         # Receive metadata
-        metadata_size_data = recv_exact(client_socket, 4)
+        metadata_size_data = recv_exact(client_socket, METADATA_LENGTH.size)
         if not metadata_size_data:
             raise Exception("Failed to receive metadata size")
             
-        metadata_size = struct.unpack('!I', metadata_size_data)[0]
+        metadata_size, = METADATA_LENGTH.unpack(metadata_size_data)
         
         if metadata_size > 10 * 1024 * 1024:  # 10MB max for metadata
             raise Exception("Metadata too large")
@@ -93,12 +150,17 @@ def handle_client(client_socket, ui, failed_validations):
         if not metadata_data:
             raise Exception("Failed to receive metadata")
             
-        metadata = json.loads(metadata_data.decode('utf-8'))
+        metadata = json.loads(metadata_data)
+
+        # One receive buffer serves every file on this connection
+        buffer = memoryview(bytearray(BUFFER_SIZE))
 
-        if metadata['type'] == TRANSFER_TYPES['FILE']:
-            receive_file(client_socket, metadata, ui, failed_validations)
-        elif metadata['type'] == TRANSFER_TYPES['DIRECTORY']:
-            receive_directory(client_socket, metadata, ui, failed_validations)
+        if metadata['type'] == TransferType.FILE:
+            receive_file(client_socket, metadata, buffer, ui, failed_validations)
+        elif metadata['type'] == TransferType.DIRECTORY:
+            receive_directory(client_socket, metadata, buffer, ui, failed_validations)
+        elif metadata['type'] == TransferType.DIRECTORY_PART:
+            receive_directory_part(client_socket, metadata, buffer)
         else:
             raise Exception(f"Unknown transfer type: {metadata['type']}")
 
@@ -111,71 +173,152 @@ def handle_client(client_socket, ui, failed_validations):
             pass
 
 
-def recv_exact(sock, size):
-    """Receive exactly 'size' bytes from socket"""
-    data = b''
-    while len(data) < size:
-        chunk = sock.recv(size - len(data))
-        if not chunk:
-            return None
-        data += chunk
-    return data
+def receive_file_contents(client_socket, f, file_size, buffer, hasher, report_progress):
+    """Receive file_size bytes into an open file, hashing them as they arrive (unless hasher is None)"""
+    # report_progress receives the number of bytes of this file received so far
+    if WRITE_BUFFERS > 1 and file_size > len(buffer):
+        return receive_file_contents_pipelined(client_socket, f, file_size, buffer, hasher, report_progress)
 
+    # Bound methods are looked up once rather than on every chunk
+    recv_into = client_socket.recv_into
+    write = f.write
+    update_hash = hasher.update if hasher else None
+    buffer_size = len(buffer)
 
-def receive_file(client_socket, file_info, ui, failed_validations):
+    received = 0
+    while received < file_size:
+        # Never read past this payload: its digest or the next file follows
+        try:
+            n = recv_into(buffer, min(buffer_size, file_size - received))
+        except socket.error as e:
+            raise Exception(f"Network error during transfer: {e}")
+        if not n:
+            raise Exception("Connection lost during file transfer")
+
+        chunk = buffer[:n]
+        write(chunk)
+        if update_hash:
+            update_hash(chunk)
+        received += n
+        report_progress(received)
+    return received
+
+
+def receive_file_contents_pipelined(client_socket, f, file_size, buffer, hasher, report_progress):
+    """Receive into a pool of buffers while a writer thread hashes and writes the full ones"""
+    # Keeps the socket drained while the disk is busy, so the sender is not
+    # throttled by a full receive window during each write
+    free = queue.Queue()
+    free.put(buffer)
+    for _ in range(WRITE_BUFFERS - 1):
+        free.put(memoryview(bytearray(len(buffer))))
+    filled = queue.Queue()
+    errors = []
+
+    def write_chunks():
+        while True:
+            item = filled.get()
+            if item is None:
+                return
+            chunk, n = item
+            if not errors:
+                try:
+                    data = chunk[:n]
+                    # The file is unbuffered, so a write may be partial
+                    written = 0
+                    while written < n:
+                        written += f.write(data[written:])
+                    if hasher:
+                        hasher.update(data)
+                except Exception as e:
+                    errors.append(e)
+            # Buffers always go back, so the receiving side never waits forever
+            free.put(chunk)
+
+    writer = threading.Thread(target=write_chunks, daemon=True)
+    writer.start()
+
+    recv_into = client_socket.recv_into
+    buffer_size = len(buffer)
+    received = 0
+    try:
+        while received < file_size and not errors:
+            chunk = free.get()
+            size = min(buffer_size, file_size - received)
+            # Fill the whole buffer before handing it over to keep writes large
+            n = 0
+            while n < size:
+                try:
+                    count = recv_into(chunk[n:size])
+                except socket.error as e:
+                    raise Exception(f"Network error during transfer: {e}")
+                if not count:
+                    raise Exception("Connection lost during file transfer")
+                n += count
+                received += count
+                report_progress(received)
+            filled.put((chunk, n))
+    finally:
+        filled.put(None)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+    return received
+
+
+def receive_checksum(client_socket, hasher):
+    """Read the digest trailer sent after a payload; returns (expected, received) hex digests"""
+    trailer = recv_exact(client_socket, hasher.digest_size)
+    if trailer is None:
+        raise Exception("Connection lost before checksum was received")
+    return trailer.hex(), hasher.hexdigest()
+
+
+def receive_file(client_socket, file_info, buffer, ui, failed_validations):
     """Receive a single file with progress tracking"""
     ensure_directory(RECEIVED_DIR)
     filepath = os.path.join(RECEIVED_DIR, file_info['name'])
 
-    ui.stdscr.clear()
     ui.draw_header(f"📥 Receiving: {file_info['name']}")
     ui.print_colored(4, 2, f"📄 Size: {format_size(file_info['size'])}", 'info')
     ui.stdscr.refresh()
 
     try:
         # Send acknowledgment that metadata was received
-        client_socket.send(b'ACK1')
+        client_socket.sendall(b'ACK1')
 
         progress = ProgressTracker(file_info['size'], f"📥 Receiving {file_info['name']}", ui)
-
-        with open(filepath, 'wb') as f:
-            received = 0
-            total_size = file_info['size']
-
-            while received < total_size:
-                remaining = total_size - received
-                chunk_size = min(BUFFER_SIZE, remaining)
-                
-                try:
-                    data = client_socket.recv(chunk_size)
-                    if not data:
-                        raise Exception("Connection lost during file transfer")
-                        
-                    f.write(data)
-                    received += len(data)
-                    progress.update(received)
-                    
-                except socket.error as e:
-                    raise Exception(f"Network error during transfer: {e}")
-
-        # Verify integrity
-        ui.print_colored(ui.height - 6, 2, "🔍 Verifying file integrity...", 'warning')
-        ui.stdscr.refresh()
-        
-        received_hash = calculate_file_hash(filepath)
+        # Senders with verification turned off send no hash algorithm
+        hash_algorithm = file_info.get('hash_algorithm', HASH_ALGORITHM)
+        hasher = create_hasher(hash_algorithm) if hash_algorithm else None
+
+        with open_output_file(filepath, file_info['size']) as f:
+            preallocate_file(f, file_info['size'])
+            receive_file_contents(client_socket, f, file_info['size'], buffer, hasher, progress.update)
+
+        # Older senders put the hash in the metadata instead of a trailer
+        if hasher is None:
+            expected_hash = received_hash = None
+        elif 'hash' in file_info:
+            expected_hash, received_hash = file_info['hash'], hasher.hexdigest()
+        else:
+            expected_hash, received_hash = receive_checksum(client_socket, hasher)
         
-        if received_hash == file_info['hash']:
+        if hasher is None:
+            ui.show_message(f"✅ File received: {filepath}", 'success')
+        elif received_hash == expected_hash:
             ui.show_message(f"✅ File received and verified: {filepath}", 'success')
         else:
             failed_validations.append({
                 'file': filepath,
-                'expected': file_info['hash'][:16] + '...',
+                'expected': expected_hash[:16] + '...',
                 'received': received_hash[:16] + '...'
             })
             ui.show_message(f"⚠️ File received but integrity check failed: {filepath}", 'error')
 
         # Send completion acknowledgment
-        client_socket.send(b'DONE')
+        client_socket.sendall(b'DONE')
 
     except Exception as e:
         ui.show_message(f"❌ Error receiving file: {e}", 'error')
@@ -187,80 +330,208 @@ def receive_file(client_socket, file_info, ui, failed_validations):
             pass
 
 
-def receive_directory(client_socket, dir_info, ui, failed_validations):
+def receive_directory(client_socket, dir_info, buffer, ui, failed_validations):
     """Receive directory with progress tracking"""
     download_dir = os.path.join(RECEIVED_DIR, dir_info['name'])
     ensure_directory(download_dir)
 
-    ui.stdscr.clear()
     ui.draw_header(f"📁 Receiving Directory: {dir_info['name']}")
     ui.print_colored(4, 2, f"📊 {dir_info['total_files']} files, {format_size(dir_info['total_size'])}", 'info')
     ui.stdscr.refresh()
 
     try:
-        # Send acknowledgment that metadata was received
-        client_socket.send(b'ACK1')
-
         progress = ProgressTracker(dir_info['total_size'], f"📁 Receiving {dir_info['name']}", ui)
-        received_total = 0
-
-        for i, file_info in enumerate(dir_info['files'], 1):
-            # Update current file info
-            current_file_y = ui.height - 5
-            ui.stdscr.move(current_file_y, 0)
-            ui.stdscr.clrtoeol()
-            ui.print_colored(current_file_y, 2, f"📄 [{i}/{dir_info['total_files']}] {file_info['path']}", 'special')
-            ui.stdscr.refresh()
-
-            file_path = os.path.join(download_dir, file_info['path'])
-            ensure_directory(os.path.dirname(file_path))
 
-            try:
-                with open(file_path, 'wb') as f:
-                    file_received = 0
-                    file_size = file_info['size']
-
-                    while file_received < file_size:
-                        remaining = file_size - file_received
-                        chunk_size = min(BUFFER_SIZE, remaining)
-                        
-                        try:
-                            data = client_socket.recv(chunk_size)
-                            if not data:
-                                raise Exception(f"Connection lost during {file_info['path']} transfer")
-                                
-                            f.write(data)
-                            file_received += len(data)
-                            received_total += len(data)
-                            progress.update(received_total)
-                            
-                        except socket.error as e:
-                            raise Exception(f"Network error during {file_info['path']}: {e}")
-
-                # Send acknowledgment for each file
-                client_socket.send(b'ACK2')
-                
-            except Exception as e:
-                ui.show_message(f"❌ Error receiving {file_info['path']}: {e}", 'error')
-                # Try to clean up partial file
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except:
-                    pass
-                raise
+        if dir_info.get('connections', 1) > 1 and dir_info.get('transfer_id'):
+            failed_count = receive_directory_parallel(client_socket, dir_info, download_dir, progress, ui, failed_validations)
+        else:
+            # Send acknowledgment that metadata was received
+            client_socket.sendall(b'ACK1')
+            failed_count = receive_directory_files(client_socket, dir_info, download_dir, buffer, progress, ui, failed_validations)
 
         # Send final completion acknowledgment
-        client_socket.send(b'DONE')
-        ui.show_message(f"✅ Directory received: {download_dir}", 'success')
+        client_socket.sendall(b'DONE')
+        if failed_count:
+            ui.show_message(f"⚠️ Directory received but {failed_count} file(s) failed integrity check: {download_dir}", 'error')
+        elif dir_info.get('hash_algorithm'):
+            ui.show_message(f"✅ Directory received and verified: {download_dir}", 'success')
+        else:
+            ui.show_message(f"✅ Directory received: {download_dir}", 'success')
 
     except Exception as e:
         ui.show_message(f"❌ Error receiving directory: {e}", 'error')
 
 
+def receive_directory_file(client_socket, dir_info, file_info, download_dir, buffer, report_progress, failed_validations):
+    """Receive one file of a directory transfer; returns False if its integrity check failed"""
+    hash_algorithm = dir_info.get('hash_algorithm')
+    file_path = os.path.join(download_dir, file_info['path'])
+    ensure_directory(os.path.dirname(file_path))
+    verified = True
+
+    try:
+        hasher = create_hasher(hash_algorithm) if hash_algorithm else None
+        with open_output_file(file_path, file_info['size']) as f:
+            preallocate_file(f, file_info['size'])
+            receive_file_contents(client_socket, f, file_info['size'], buffer, hasher, report_progress)
+
+        # Senders that stream hashes follow each file with its digest
+        if hash_algorithm:
+            expected_hash, received_hash = receive_checksum(client_socket, hasher)
+            if received_hash != expected_hash:
+                verified = False
+                failed_validations.append({
+                    'file': file_path,
+                    'expected': expected_hash[:16] + '...',
+                    'received': received_hash[:16] + '...'
+                })
+
+        # Older senders wait for an acknowledgment after each file; current ones
+        # stream the next file straight away and only wait for DONE
+        if dir_info.get('file_acks', True):
+            enable_quickack(client_socket)
+            client_socket.sendall(b'ACK2')
+        return verified
+
+    except Exception as e:
+        # Try to clean up partial file
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except:
+            pass
+        # Reported by receive_directory, which also owns the screen while
+        # parallel connections are still drawing
+        raise Exception(f"Error receiving {file_info['path']}: {e}")
+
+
+def receive_directory_files(client_socket, dir_info, download_dir, buffer, progress, ui, failed_validations):
+    """Receive directory files one after another over a single connection"""
+    received_total = 0
+    failed_count = 0
+
+    # Older senders list every file in a JSON manifest instead of sending
+    # a header in front of each one
+    manifest = iter(dir_info['files']) if 'files' in dir_info else None
+
+    for i in range(1, dir_info['total_files'] + 1):
+        file_info = next(manifest) if manifest else recv_file_header(client_socket)
+        if file_info is None:
+            raise Exception("Sender ended the directory early")
+        ui.show_current_file(i, dir_info['total_files'], file_info['path'])
+
+        if not receive_directory_file(client_socket, dir_info, file_info, download_dir, buffer,
+                                      lambda received: progress.update(received_total + received),
+                                      failed_validations):
+            failed_count += 1
+        received_total += file_info['size']
+
+    if manifest is None and recv_file_header(client_socket) is not None:
+        raise Exception("Sender sent more files than announced")
+
+    return failed_count
+
+
+def receive_directory_parallel(client_socket, dir_info, download_dir, progress, ui, failed_validations):
+    """Wait while the sender's parallel connections deliver the directory files"""
+    transfer = {
+        'dir_info': dir_info,
+        'download_dir': download_dir,
+        'progress': progress,
+        'ui': ui,
+        'failed_validations': failed_validations,
+        'received_total': 0,
+        'started': 0,
+        'remaining': dir_info['total_files'],
+        'failed_count': 0,
+        'error': None,
+        'last_activity': time.monotonic(),
+        # Progress and curses calls are shared between connections, so serialise them
+        'lock': threading.Lock(),
+        'done': threading.Event()
+    }
+    if not dir_info['total_files']:
+        transfer['done'].set()
+
+    with parallel_transfers_lock:
+        parallel_transfers[dir_info['transfer_id']] = transfer
+
+    # The sender says nothing more on this connection until it reads DONE, so
+    # it becoming readable means the sender gave up and closed it
+    watcher = selectors.DefaultSelector()
+    watcher.register(client_socket, selectors.EVENT_READ)
+    try:
+        # Tell the sender it may open its parallel connections
+        client_socket.sendall(b'ACKP')
+        while not transfer['done'].wait(0.25):
+            if watcher.select(timeout=0):
+                raise Exception(transfer['error'] or "Sender closed the connection during directory transfer")
+            if time.monotonic() - transfer['last_activity'] > 60:
+                raise Exception("Timed out waiting for parallel connections")
+    finally:
+        watcher.close()
+        with parallel_transfers_lock:
+            parallel_transfers.pop(dir_info['transfer_id'], None)
+
+    if transfer['error']:
+        raise Exception(transfer['error'])
+    return transfer['failed_count']
+
+
+def receive_directory_part(client_socket, part_info, buffer):
+    """Receive files of a directory transfer over one of its parallel connections"""
+    with parallel_transfers_lock:
+        transfer = parallel_transfers.get(part_info.get('transfer_id'))
+    if transfer is None:
+        raise Exception("Unknown directory transfer")
+
+    dir_info = transfer['dir_info']
+    ui = transfer['ui']
+    lock = transfer['lock']
+    client_socket.sendall(b'ACK1')
+
+    try:
+        while True:
+            file_info = recv_file_header(client_socket)
+            if file_info is None:
+                break
+
+            with lock:
+                transfer['started'] += 1
+                ui.show_current_file(transfer['started'], dir_info['total_files'], file_info['path'])
+
+            file_received = 0
+
+            def report_progress(received):
+                nonlocal file_received
+                with lock:
+                    transfer['received_total'] += received - file_received
+                    transfer['last_activity'] = time.monotonic()
+                    file_received = received
+                    transfer['progress'].update(transfer['received_total'])
+
+            verified = receive_directory_file(client_socket, dir_info, file_info, transfer['download_dir'],
+                                              buffer, report_progress, transfer['failed_validations'])
+
+            with lock:
+                if not verified:
+                    transfer['failed_count'] += 1
+                transfer['remaining'] -= 1
+                transfer['last_activity'] = time.monotonic()
+                if transfer['remaining'] == 0:
+                    transfer['done'].set()
+
+    except Exception as e:
+        # receive_directory shows the first error once the transfer is
+        # abandoned, rather than this thread drawing outside the lock
+        with lock:
+            if not transfer['error']:
+                transfer['error'] = str(e)
+        transfer['done'].set()
+
+
 def show_validation_summary(ui, failed_validations):
     """Show summary of failed validations"""
-    ui.stdscr.clear()
     ui.draw_header("⚠️ File Validation Summary")
     ui.print_colored(4, 2, f"❌ {len(failed_validations)} file(s) failed integrity check:", 'error')
 
@@ -1,12 +1,133 @@
 import json
-import struct
+import mmap
+import queue
+import threading
 import time
 import os
 import socket
-from network import create_socket
-from utils import calculate_file_hash, collect_directory_files, format_size
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from network import create_socket, recv_exact, pack_file_header, END_OF_FILES, FILE_HEADER, METADATA_LENGTH
+from utils import (create_hasher, collect_directory_files, format_size, hash_file_range,
+                   advise_sequential_read, drop_cached_pages)
 from progress import ProgressTracker
-from config import BUFFER_SIZE, TRANSFER_TYPES
+from config import (BUFFER_SIZE, HASH_ALGORITHM, VERIFY_TRANSFERS, TransferType, USE_SENDFILE,
+                    ZEROCOPY_THRESHOLD, DIRECTORY_CONNECTIONS)
+
+
+# socket.sendfile falls back to plain read/send without os.sendfile (e.g. on
+# Windows), which would read each slice twice once it is also hashed
+ZEROCOPY_AVAILABLE = USE_SENDFILE and hasattr(os, 'sendfile')
+
+# Without sendfile, large files are sent from a read-only mapping instead of
+# being copied into a buffer first. Only on Windows, which refuses to truncate
+# a mapped file; elsewhere a file shrinking mid-send would raise SIGBUS
+MMAP_AVAILABLE = not ZEROCOPY_AVAILABLE and os.name == 'nt'
+
+# Linux: hold back a small write until the data sent after it fills the segment
+MSG_MORE = getattr(socket, 'MSG_MORE', 0)
+
+# File bytes handed to each sendfile call; progress is reported between calls
+SENDFILE_SLICE = 4 * BUFFER_SIZE
+
+# Most small files gathered into one write, so runs of empty or tiny files
+# still report progress and show the current file as they go
+BATCH_MAX_FILES = 1024
+
+# Hashes files being sent with sendfile alongside the send itself
+hash_executor = ThreadPoolExecutor(max_workers=DIRECTORY_CONNECTIONS, thread_name_prefix='hash')
+
+
+def send_metadata(sock, info):
+    """Send length-prefixed JSON metadata as a single write (one TCP segment)"""
+    metadata = json.dumps(info, separators=(',', ':')).encode('utf-8')
+    sock.sendall(METADATA_LENGTH.pack(len(metadata)) + metadata)
+
+
+def send_file_contents(sock, f, file_size, report_progress, header=b''):
+    """Stream an open file over the socket, after an optional header, followed by its hash digest
+    (omitted when VERIFY_TRANSFERS is off)"""
+    # report_progress receives the number of bytes of this file sent so far.
+    # Hash while sending so the file is only read from disk once
+    hasher = create_hasher() if VERIFY_TRANSFERS else None
+    sent = 0
+
+    # Small files are not worth the extra system calls
+    large = file_size >= ZEROCOPY_THRESHOLD
+    if large:
+        advise_sequential_read(f)
+
+    if ZEROCOPY_AVAILABLE and large:
+        # TCP_NODELAY would push the header out as a tiny segment of its own;
+        # MSG_MORE lets it share a segment with the start of the payload
+        if header:
+            sock.sendall(header, MSG_MORE)
+        # Hash on a worker thread with its own positional reads while the
+        # kernel moves file pages straight to the socket, so the two overlap
+        # instead of taking turns (hashlib releases the GIL on large updates)
+        if hasher:
+            stop_hashing = threading.Event()
+            hashed = hash_executor.submit(hash_file_range, f, file_size, hasher, stop_hashing)
+        try:
+            while sent < file_size:
+                count = sock.sendfile(f, sent, min(SENDFILE_SLICE, file_size - sent))
+                if not count:
+                    break
+                sent += count
+                report_progress(sent)
+        except BaseException:
+            # The caller closes the file next, so stop reading it first
+            if hasher:
+                stop_hashing.set()
+                wait([hashed])
+            raise
+        if hasher and hashed.result() < file_size:
+            raise Exception("File was truncated while being sent")
+    elif MMAP_AVAILABLE and large:
+        if header:
+            sock.sendall(header)
+        sendall = sock.sendall
+        update_hash = hasher.update if hasher else None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            end = min(file_size, len(mapped))
+            while sent < end:
+                # Slices must be released before the mapping can be closed
+                with view[sent:min(sent + BUFFER_SIZE, end)] as chunk:
+                    sendall(chunk)
+                    if update_hash:
+                        update_hash(chunk)
+                    sent += len(chunk)
+                report_progress(sent)
+    else:
+        view = memoryview(bytearray(BUFFER_SIZE + len(header)))
+        # The header rides in front of the first chunk so small files need one write
+        offset = len(header)
+        view[:offset] = header
+        readinto = f.readinto
+        sendall = sock.sendall
+        update_hash = hasher.update if hasher else None
+        while sent < file_size:
+            n = readinto(view[offset:offset + min(BUFFER_SIZE, file_size - sent)])
+            if not n:
+                break
+            sendall(view[:offset + n])
+            if update_hash:
+                update_hash(view[offset:offset + n])
+            offset = 0
+            sent += n
+            report_progress(sent)
+        if offset:
+            sock.sendall(view[:offset])
+
+    if sent < file_size:
+        raise Exception("File was truncated while being sent")
+
+    if hasher:
+        sock.sendall(hasher.digest())
+    # Each file is sent once, so keep it from crowding other data out of the cache
+    if large:
+        drop_cached_pages(f)
+    return sent
 
 
 def send_file(filepath, target_ip, port, local_ip, ui):
@@ -18,7 +139,6 @@ def send_file(filepath, target_ip, port, local_ip, ui):
     filename = os.path.basename(filepath)
     file_size = os.path.getsize(filepath)
 
-    ui.stdscr.clear()
     ui.draw_header(f"📤 Sending File: {filename}")
     ui.print_colored(4, 2, f"📄 Size: {format_size(file_size)}", 'info')
     ui.print_colored(5, 2, f"🎯 Target: {target_ip}", 'info')
@@ -33,27 +153,20 @@ def send_file(filepath, target_ip, port, local_ip, ui):
         ui.stdscr.refresh()
         sock.connect((target_ip, port))
 
-        # Calculate hash
-        ui.print_colored(8, 2, "🔍 Calculating file hash...", 'warning')
-        ui.stdscr.refresh()
-        file_hash = calculate_file_hash(filepath)
-
-        # Prepare metadata
+        # Prepare metadata (the hash follows the payload as a trailer)
         file_info = {
-            'type': TRANSFER_TYPES['FILE'],
+            'type': TransferType.FILE,
             'name': filename,
             'size': file_size,
-            'hash': file_hash,
+            'hash_algorithm': HASH_ALGORITHM if VERIFY_TRANSFERS else None,
             'timestamp': time.time()
         }
 
         # Send metadata
-        metadata = json.dumps(file_info).encode('utf-8')
-        sock.send(struct.pack('!I', len(metadata)))
-        sock.send(metadata)
+        send_metadata(sock, file_info)
 
         # Wait for acknowledgment
-        ack = sock.recv(4)
+        ack = recv_exact(sock, 4)
         if ack != b'ACK1':
             raise Exception("Failed to receive metadata acknowledgment")
 
@@ -61,25 +174,13 @@ def send_file(filepath, target_ip, port, local_ip, ui):
         progress = ProgressTracker(file_size, f"📤 Sending {filename}", ui)
         
         with open(filepath, 'rb') as f:
-            sent = 0
-            while sent < file_size:
-                remaining = file_size - sent
-                chunk_size = min(BUFFER_SIZE, remaining)
-                chunk = f.read(chunk_size)
-                
-                if not chunk:
-                    break
-                
-                # Send chunk with error handling
-                try:
-                    sock.sendall(chunk)
-                    sent += len(chunk)
-                    progress.update(sent)
-                except socket.error as e:
-                    raise Exception(f"Connection lost during transfer: {e}")
+            try:
+                send_file_contents(sock, f, file_size, progress.update)
+            except socket.error as e:
+                raise Exception(f"Connection lost during transfer: {e}")
 
         # Wait for completion acknowledgment
-        final_ack = sock.recv(4)
+        final_ack = recv_exact(sock, 4)
         if final_ack != b'DONE':
             raise Exception("Failed to receive completion acknowledgment")
 
@@ -103,6 +204,147 @@ def send_file(filepath, target_ip, port, local_ip, ui):
                 pass
 
 
+def group_files(files_info):
+    """Split files into send batches: each large file alone, runs of small files
+    together so a whole run goes out in one write"""
+    # Each file also costs its header and digest on the wire, which is what
+    # dominates a run of empty or tiny files
+    digest_size = create_hasher().digest_size if VERIFY_TRANSFERS else 0
+    batch, batch_size = [], 0
+    for file_info in files_info:
+        if file_info['size'] >= ZEROCOPY_THRESHOLD:
+            if batch:
+                yield batch
+                batch, batch_size = [], 0
+            yield [file_info]
+            continue
+
+        batch.append(file_info)
+        batch_size += (file_info['size'] + FILE_HEADER.size
+                       + len(file_info['path'].encode('utf-8')) + digest_size)
+        if batch_size >= BUFFER_SIZE or len(batch) >= BATCH_MAX_FILES:
+            yield batch
+            batch, batch_size = [], 0
+    if batch:
+        yield batch
+
+
+def send_file_batch(sock, batch, report_progress):
+    """Send a batch from group_files (header, payload and digest per file);
+    returns the number of file bytes sent"""
+    # report_progress receives the number of bytes of this batch sent so far
+    file_info = batch[0]
+    try:
+        if len(batch) == 1 and file_info['size'] >= ZEROCOPY_THRESHOLD:
+            with open(file_info['full_path'], 'rb') as f:
+                sent = send_file_contents(sock, f, file_info['size'], report_progress,
+                                          pack_file_header(file_info['path'], file_info['size']))
+        else:
+            # Small files cost more in per-file overhead and round trips than
+            # in bytes, so gather the whole run into a single write
+            parts = []
+            sent = 0
+            for file_info in batch:
+                with open(file_info['full_path'], 'rb') as f:
+                    data = f.read(file_info['size'])
+                if len(data) < file_info['size']:
+                    raise Exception("File was truncated while being sent")
+                parts.append(pack_file_header(file_info['path'], file_info['size']))
+                parts.append(data)
+                if VERIFY_TRANSFERS:
+                    hasher = create_hasher()
+                    hasher.update(data)
+                    parts.append(hasher.digest())
+                sent += len(data)
+            sock.sendall(b''.join(parts))
+            report_progress(sent)
+    except Exception as e:
+        raise Exception(f"Error sending file {file_info['path']}: {e}")
+
+    return sent
+
+
+def send_directory_files(sock, files_info, progress, ui):
+    """Send directory files one batch after another over a single connection"""
+    sent_total = 0
+    started = 0
+
+    for batch in group_files(files_info):
+        started += len(batch)
+        ui.show_current_file(started, len(files_info), batch[-1]['path'])
+        sent_total += send_file_batch(sock, batch, lambda sent: progress.update(sent_total + sent))
+
+    sock.sendall(END_OF_FILES)
+
+
+def send_directory_parallel(dir_info, files_info, target_ip, port, local_ip, progress, ui):
+    """Send directory files over several connections pulling from a shared queue"""
+    file_queue = queue.Queue()
+    for batch in group_files(files_info):
+        file_queue.put(batch)
+
+    # Progress and curses calls are shared between workers, so serialise them
+    state = {'sent_total': 0, 'started': 0, 'failed': False, 'lock': threading.Lock()}
+
+    def next_batch():
+        try:
+            return file_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def worker():
+        # Take a batch before connecting: a connection that arrived with nothing
+        # to send could find the receiver already finished with the transfer
+        batch = next_batch()
+        if batch is None:
+            return
+
+        sock = create_socket(local_ip)
+        try:
+            sock.settimeout(60)
+            sock.connect((target_ip, port))
+            send_metadata(sock, {
+                'type': TransferType.DIRECTORY_PART,
+                'transfer_id': dir_info['transfer_id']
+            })
+            if recv_exact(sock, 4) != b'ACK1':
+                raise Exception("Receiver rejected parallel connection")
+
+            while batch is not None and not state['failed']:
+                with state['lock']:
+                    state['started'] += len(batch)
+                    ui.show_current_file(state['started'], len(files_info), batch[-1]['path'])
+
+                batch_sent = 0
+
+                def report_progress(sent):
+                    nonlocal batch_sent
+                    with state['lock']:
+                        state['sent_total'] += sent - batch_sent
+                        batch_sent = sent
+                        progress.update(state['sent_total'])
+
+                send_file_batch(sock, batch, report_progress)
+                batch = next_batch()
+
+            sock.sendall(END_OF_FILES)
+        except Exception:
+            state['failed'] = True
+            raise
+        finally:
+            try:
+                sock.close()
+            except:
+                pass
+
+    with ThreadPoolExecutor(max_workers=dir_info['connections']) as executor:
+        futures = [executor.submit(worker) for _ in range(dir_info['connections'])]
+
+    # Surface the first worker error, if any
+    for future in futures:
+        future.result()
+
+
 def send_directory(dir_path, target_ip, port, local_ip, ui):
     """Send entire directory with progress tracking"""
     if not os.path.isdir(dir_path):
@@ -110,7 +352,6 @@ def send_directory(dir_path, target_ip, port, local_ip, ui):
         return False
 
     dirname = os.path.basename(dir_path)
-    ui.stdscr.clear()
     ui.draw_header(f"📁 Sending Directory: {dirname}")
 
     sock = None
@@ -135,65 +376,42 @@ def send_directory(dir_path, target_ip, port, local_ip, ui):
         ui.print_colored(6, 2, f"📊 Found {len(files_info)} files, total size: {format_size(total_size)}", 'info')
         ui.stdscr.refresh()
 
-        # Send directory metadata
+        # Send directory metadata; each file's path and size follow in a
+        # binary header in front of its payload instead of a JSON manifest
         dir_info = {
-            'type': TRANSFER_TYPES['DIRECTORY'],
+            'type': TransferType.DIRECTORY,
             'name': dirname,
-            'files': files_info,
             'total_files': len(files_info),
             'total_size': total_size,
+            'hash_algorithm': HASH_ALGORITHM if VERIFY_TRANSFERS else None,
+            # Files are streamed back to back and the single DONE at the end
+            # confirms them all, so ask the receiver not to acknowledge each one
+            'file_acks': False,
             'timestamp': time.time()
         }
 
-        metadata = json.dumps(dir_info).encode('utf-8')
-        sock.send(struct.pack('!I', len(metadata)))
-        sock.send(metadata)
+        connections = min(DIRECTORY_CONNECTIONS, len(files_info))
+        if connections > 1:
+            dir_info['transfer_id'] = uuid.uuid4().hex
+            dir_info['connections'] = connections
 
-        # Wait for acknowledgment
-        ack = sock.recv(4)
-        if ack != b'ACK1':
+        send_metadata(sock, dir_info)
+
+        # Receivers that support parallel connections answer ACKP, others ACK1
+        ack = recv_exact(sock, 4)
+        if ack not in (b'ACK1', b'ACKP'):
             raise Exception("Failed to receive metadata acknowledgment")
 
         # Send files with overall progress
         progress = ProgressTracker(total_size, f"📁 Sending {dirname}", ui)
-        sent_total = 0
 
-        for i, file_info in enumerate(files_info, 1):
-            # Update current file info
-            current_file_y = ui.height - 5
-            ui.stdscr.move(current_file_y, 0)
-            ui.stdscr.clrtoeol()
-            ui.print_colored(current_file_y, 2, f"📄 [{i}/{len(files_info)}] {file_info['path']}", 'special')
-            ui.stdscr.refresh()
-
-            try:
-                with open(file_info['full_path'], 'rb') as f:
-                    file_sent = 0
-                    file_size = file_info['size']
-                    
-                    while file_sent < file_size:
-                        remaining = file_size - file_sent
-                        chunk_size = min(BUFFER_SIZE, remaining)
-                        chunk = f.read(chunk_size)
-                        
-                        if not chunk:
-                            break
-                        
-                        sock.sendall(chunk)
-                        file_sent += len(chunk)
-                        sent_total += len(chunk)
-                        progress.update(sent_total)
-                        
-                # Wait for file acknowledgment
-                file_ack = sock.recv(4)
-                if file_ack != b'ACK2':
-                    raise Exception(f"Failed to receive acknowledgment for {file_info['path']}")
-                        
-            except Exception as e:
-                raise Exception(f"Error sending file {file_info['path']}: {e}")
+        if ack == b'ACKP':
+            send_directory_parallel(dir_info, files_info, target_ip, port, local_ip, progress, ui)
+        else:
+            send_directory_files(sock, files_info, progress, ui)
 
         # Wait for final completion acknowledgment
-        final_ack = sock.recv(4)
+        final_ack = recv_exact(sock, 4)
         if final_ack != b'DONE':
             raise Exception("Failed to receive final completion acknowledgment")
 
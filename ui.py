@@ -1,12 +1,54 @@
 import curses
 import time
+import unicodedata
+from functools import lru_cache
+
+# Every "x.y%" label a progress bar can show, indexed by tenths of a percent
+PERCENT_LABELS = [f"{i / 10:.1f}%" for i in range(1001)]
+
+
+# Longest prompt answer accepted, the same limit getstr() had
+MAX_INPUT_LENGTH = 1023
+
+
+def display_width(text):
+    """Terminal cells text takes up: two for wide characters (CJK, most emoji),
+    none for combining marks and variation selectors"""
+    width = 0
+    for ch in text:
+        if unicodedata.category(ch) in ('Mn', 'Me', 'Cf'):
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+    return width
+
+
+@lru_cache(maxsize=8)
+def _header_line(title, width):
+    """Full-width header line with the title centred (titles repeat across screens)"""
+    header_text = f" {title} "
+    padding = max(0, (width - len(header_text)) // 2)
+    return (" " * padding + header_text).ljust(width)[:width]
+
 
 class CursesUI:
+    __slots__ = (
+        'stdscr', 'colors', 'height', 'width',
+        'c_success', 'c_error', 'c_warning', 'c_info',
+        'c_highlight', 'c_special', 'c_header', 'c_normal',
+        '_blank', '_title_attr', '_hline', '_block', '_shade',
+    )
+
+    # Bound once so draw methods avoid repeated curses module lookups
+    _A_BOLD = curses.A_BOLD
+    _A_NORMAL = curses.A_NORMAL
+    _error = curses.error
+
     def __init__(self):
         self.stdscr = None
         self.colors = {}
         self.height = 0
         self.width = 0
+        self._blank = ""
 
     def init_colors(self):
         if curses.has_colors():
@@ -31,70 +73,114 @@ class CursesUI:
                 'header': curses.color_pair(7) | curses.A_BOLD,
                 'normal': curses.A_NORMAL
             }
+        else:
+            self.colors = {
+                'success': curses.A_BOLD,
+                'error': curses.A_BOLD,
+                'warning': curses.A_BOLD,
+                'info': curses.A_NORMAL,
+                'highlight': curses.A_BOLD,
+                'special': curses.A_BOLD,
+                'header': curses.A_REVERSE | curses.A_BOLD,
+                'normal': curses.A_NORMAL
+            }
+
+        # Expose each attribute directly (e.g. self.c_info) for hot draw paths
+        for name, attr in self.colors.items():
+            setattr(self, "c_" + name, attr)
+        self._title_attr = self.c_highlight | curses.A_BOLD | curses.A_REVERSE
 
     def init_screen(self, stdscr):
         self.stdscr = stdscr
         curses.curs_set(0)
         self.stdscr.clear()
-        self.height, self.width = self.stdscr.getmaxyx()
+        self.update_dimensions()
         self.init_colors()
 
+        # Line-drawing glyphs are only defined once curses is initialised
+        self._hline = curses.ACS_HLINE
+        self._block = curses.ACS_BLOCK
+        self._shade = curses.ACS_CKBOARD
+
+    def update_dimensions(self):
+        """Refresh terminal size and rebuild size-dependent caches"""
+        self.height, self.width = self.stdscr.getmaxyx()
+        self._blank = " " * self.width
+
+    def handle_resize(self):
+        """Rebuild caches once per resize (ncurses reports SIGWINCH as KEY_RESIZE)"""
+        curses.update_lines_cols()
+        self.update_dimensions()
+
     def clear_terminal_buffer(self):
         """Clear terminal including scrollback buffer"""
         import os
         if os.name == 'posix':  # Unix/Linux/macOS
             # Send escape sequence to clear scrollback buffer
             self.stdscr.addstr(0, 0, '\033[3J\033[2J\033[H')
+        # No refresh here: the caller's next refresh paints the blank screen
+        # together with the new content in a single terminal update
         self.stdscr.erase()
-        self.stdscr.refresh()
+
+    def frame_end(self):
+        """Flush everything drawn this frame to the terminal in one update"""
+        self.stdscr.noutrefresh()
+        curses.doupdate()
 
     def draw_header(self, title):
         # Use complete terminal clearing for headers
         self.clear_terminal_buffer()
         
-        self.stdscr.attron(self.colors['header'])
-        header_text = f" {title} "
-        padding = (self.width - len(header_text)) // 2
-        self.stdscr.addstr(0, 0, " " * self.width)
-        self.stdscr.addstr(0, padding, header_text)
-        self.stdscr.attroff(self.colors['header'])
+        self.stdscr.addstr(0, 0, _header_line(title, self.width), self.c_header)
 
-        self.stdscr.attron(self.colors['highlight'])
-        self.stdscr.addstr(1, 0, "═" * self.width)
-        self.stdscr.attroff(self.colors['highlight'])
+        self.stdscr.hline(1, 0, self._hline | self.c_highlight, self.width)
 
     def draw_box(self, y, x, height, width, title=""):
-        # Clear the area
-        for i in range(height):
-            self.stdscr.addstr(y + i, x, " " * width)
+        addstr = self.stdscr.addstr
+        blank = self._blank[:width]
+
+        # Clear the area, skipping rows the title bar and separator overwrite
+        first_row = 0
+        if title:
+            first_row = 2 if height > 2 else 1
+        for i in range(first_row, height):
+            addstr(y + i, x, blank)
 
         # Draw bold top bar with reversed highlight and centered title
         if title:
             title_text = f" {title.upper()} "
             title_x = x + (width - len(title_text)) // 2
-            self.stdscr.attron(self.colors['highlight'] | curses.A_BOLD | curses.A_REVERSE)
-            self.stdscr.addstr(y, x, " " * width)
-            self.stdscr.addstr(y, title_x, title_text)
-            self.stdscr.attroff(self.colors['highlight'] | curses.A_BOLD | curses.A_REVERSE)
+            title_line = (blank[:max(0, title_x - x)] + title_text + blank)[:width]
+            addstr(y, x, title_line, self._title_attr)
 
         # Bold underline for separation
         if height > 2:
-            self.stdscr.attron(curses.A_BOLD)
-            self.stdscr.addstr(y + 1, x, "═" * width)
-            self.stdscr.attroff(curses.A_BOLD)
+            self.stdscr.hline(y + 1, x, self._hline | self._A_BOLD, width)
+
+    def draw_rule(self, y, x=0, width=None, color='highlight'):
+        """Draw a horizontal rule in one hline call (ncurses uses REP where supported)"""
+        if width is None:
+            width = self.width - x
+        if 0 <= y < self.height and width > 0:
+            self.stdscr.hline(y, x, self._hline | self.colors.get(color, self._A_NORMAL), width)
 
     def draw_progress_bar(self, y, x, width, progress, title="", color='info'):
-        filled = int(progress * (width - 2))
-        bar = "█" * filled + "░" * (width - 2 - filled)
+        stdscr = self.stdscr
+        attr = self.colors.get(color, self._A_NORMAL)
+        inner = width - 2
+        filled = int(progress * inner)
 
-        self.stdscr.attron(self.colors[color])
-        self.stdscr.addstr(y, x, f"[{bar}]")
-        self.stdscr.attroff(self.colors[color])
+        stdscr.addstr(y, x, "[", attr)
+        if filled > 0:
+            stdscr.hline(y, x + 1, self._block | attr, filled)
+        if inner - filled > 0:
+            stdscr.hline(y, x + 1 + filled, self._shade | attr, inner - filled)
+        stdscr.addstr(y, x + width - 1, "]", attr)
 
         if title:
             self.stdscr.addstr(y - 1, x, title[:width])
 
-        percentage = f"{progress * 100:.1f}%"
+        percentage = PERCENT_LABELS[min(1000, max(0, round(progress * 1000)))]
         perc_x = x + width - len(percentage)
         self.stdscr.addstr(y, perc_x, percentage)
 
@@ -102,45 +188,125 @@ class CursesUI:
         if max_width:
             text = text[:max_width]
 
-        if y >= 0 and y < self.height and x >= 0 and x + len(text) <= self.width:
+        if 0 <= y < self.height and 0 <= x and x + len(text) <= self.width:
+            try:
+                self.stdscr.addstr(y, x, text, self.colors.get(color, self._A_NORMAL))
+            except self._error:
+                pass
+
+    def print_attr(self, y, x, text, attr):
+        """print_colored for hot paths that already hold an attribute (e.g. self.c_info)"""
+        if 0 <= y < self.height and 0 <= x and x + len(text) <= self.width:
             try:
-                self.stdscr.attron(self.colors[color])
-                self.stdscr.addstr(y, x, text)
-                self.stdscr.attroff(self.colors[color])
-            except curses.error:
+                self.stdscr.addstr(y, x, text, attr)
+            except self._error:
                 pass
 
+    def draw_colored_segments(self, y, x, segments):
+        """Draw (text, attr) segments one after another on a line, clipped to the screen"""
+        if not 0 <= y < self.height:
+            return
+        addnstr = self.stdscr.addnstr
+        for text, attr in segments:
+            remaining = self.width - 1 - x
+            if remaining <= 0:
+                break
+            try:
+                addnstr(y, x, text, remaining, attr)
+            except self._error:
+                pass
+            x += len(text)
+
     def get_input(self, y, x, prompt, color='info'):
         curses.curs_set(1)
         self.print_colored(y, x, prompt, color)
-        self.stdscr.refresh()
 
-        curses.echo()
-        try:
-            input_str = self.stdscr.getstr(y, x + len(prompt)).decode('utf-8')
-        except:
-            input_str = ""
-        curses.noecho()
+        # Read one character at a time into a list and join once at the end,
+        # echoing manually so non-ASCII input never has to be decoded from bytes
+        start_x = x + display_width(prompt)
+        chars = []
+        self._echo_input(y, start_x, chars)
+
+        while True:
+            try:
+                ch = self.stdscr.get_wch()
+            except self._error:
+                continue
+
+            if ch in ('\n', '\r') or ch == curses.KEY_ENTER:
+                break
+            elif ch == curses.KEY_RESIZE:
+                self.handle_resize()
+            elif ch in ('\b', '\x7f') or ch == curses.KEY_BACKSPACE:
+                if not chars:
+                    continue
+                chars.pop()
+            elif isinstance(ch, str) and ch.isprintable() and len(chars) < MAX_INPUT_LENGTH:
+                chars.append(ch)
+            else:
+                continue
+            self._echo_input(y, start_x, chars)
+
         curses.curs_set(0)
+        return "".join(chars)
+
+    def _echo_input(self, y, start_x, chars):
+        """Show typed input after its prompt; input too long for the line
+        scrolls to show its end, after a leading ellipsis"""
+        field = self.width - 1 - start_x
+        if field <= 0 or not 0 <= y < self.height:
+            return
 
-        return input_str
+        # Walk back from the end only as far as fits, keeping one cell for the cursor
+        budget = field - 1
+        used = 0
+        start = len(chars)
+        while start > 0:
+            w = display_width(chars[start - 1])
+            if used + w > budget:
+                break
+            used += w
+            start -= 1
+        if start:
+            # Make room for the ellipsis
+            while used > budget - 1:
+                used -= display_width(chars[start])
+                start += 1
+        text = ("…" if start else "") + "".join(chars[start:])
+
+        try:
+            self.stdscr.move(y, start_x)
+            self.stdscr.clrtoeol()
+            self.stdscr.addstr(y, start_x, text)
+            self.stdscr.move(y, start_x + display_width(text))
+        except self._error:
+            pass
+
+    def poll_key(self, timeout=0):
+        """Return the next keypress, or None if none arrives within timeout
+        milliseconds (0 returns at once, -1 waits), so a loop can redraw between polls"""
+        self.stdscr.timeout(timeout)
+        key = self.stdscr.getch()
+        return None if key == -1 else key
 
     def get_single_key(self, y, x, prompt, valid_keys=None, color='info'):
         """Get a single keypress without requiring Enter"""
         self.print_colored(y, x, prompt, color)
-        self.stdscr.refresh()
+        self.frame_end()
         
         # Clear input buffer first
-        self.stdscr.timeout(10)
-        while self.stdscr.getch() != -1:
-            pass
-        self.stdscr.timeout(-1)  # Reset to blocking
+        curses.flushinp()
+        self.stdscr.timeout(-1)  # Blocking reads
         
         while True:
             key = self.stdscr.getch()
             
             if key == -1:  # Timeout or error
                 continue
+
+            if key == curses.KEY_RESIZE:
+                self.handle_resize()
+                continue
             
             # Convert to character if it's a regular key
             if 32 <= key <= 126:  # Printable ASCII range
@@ -156,16 +322,28 @@ class CursesUI:
             elif key == ord('\n') or key == ord('\r'):
                 return 'ENTER'
 
+    def show_current_file(self, index, total, path):
+        """Show which file of a directory transfer is in progress"""
+        current_file_y = self.height - 5
+        self.stdscr.move(current_file_y, 0)
+        self.stdscr.clrtoeol()
+        self.print_colored(current_file_y, 2, f"📄 [{index}/{total}] {path}", 'special')
+        self.frame_end()
+
     def show_message(self, message, color='info', duration=2):
         msg_y = self.height - 3
-        # Clear the message line completely before displaying new message
-        self.stdscr.move(msg_y, 0)
-        self.stdscr.clrtoeol()
-        self.print_colored(msg_y, 2, message, color)
-        self.stdscr.refresh()
+        # Pad the message over the whole line so one write replaces the old one.
+        # Two columns are left spare for wide (emoji) characters.
+        line_width = max(0, self.width - 2)
+        line = ("  " + message + self._blank)[:line_width]
+        try:
+            self.stdscr.addstr(msg_y, 0, line, self.colors.get(color, self._A_NORMAL))
+        except self._error:
+            pass
+        self.frame_end()
         if duration > 0:
             time.sleep(duration)
             # Clear the message after displaying it
             self.stdscr.move(msg_y, 0)
             self.stdscr.clrtoeol()
-            self.stdscr.refresh()
\ No newline at end of file
+            self.frame_end()
\ No newline at end of file
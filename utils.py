@@ -1,64 +1,197 @@
 """Utility functions for file operations and formatting"""
 
+import errno
 import hashlib
+import io
 import os
-from pathlib import Path
-from config import HASH_CHUNK_SIZE, HASH_ALGORITHM
+from config import BUFFER_SIZE, HASH_CHUNK_SIZE, HASH_ALGORITHM, WRITE_BUFFERS
 
 
-def calculate_file_hash(filepath):
-    """Calculate hash of file using algorithm set in config"""
+def create_hasher(algorithm=HASH_ALGORITHM):
+    """Create a hash object for the given algorithm (config default)"""
+    if algorithm.lower() == 'blake3':
+        # Optional: SIMD and multi-threaded, much faster than SHA-2 without SHA extensions
+        try:
+            from blake3 import blake3
+        except ImportError:
+            raise ValueError("Unsupported hash algorithm: blake3 (install with: pip install blake3)")
+        return blake3()
+
     try:
-        hash_func = hashlib.new(HASH_ALGORITHM)
+        try:
+            # Marking the hash as non-security keeps OpenSSL's accelerated
+            # implementation available on FIPS-restricted builds
+            return hashlib.new(algorithm, usedforsecurity=False)
+        except TypeError:  # Python < 3.9
+            return hashlib.new(algorithm)
     except ValueError:
-        raise ValueError(f"Unsupported hash algorithm: {HASH_ALGORITHM}")
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+
+def hash_acceleration_warning(algorithm=HASH_ALGORITHM):
+    """Return a warning when hashing is likely to limit (or break) transfers, otherwise None"""
+    if algorithm.lower() == 'blake3':
+        try:
+            create_hasher(algorithm)
+        except ValueError:
+            return "blake3 is not installed (pip install blake3); transfers will fail"
+        return None
+
+    # OpenSSL-backed hashes come from _hashlib; the builtin fallbacks
+    # never use the CPU's SHA instructions
+    if algorithm.lower() in ('sha1', 'sha224', 'sha256'):
+        if type(create_hasher(algorithm)).__module__ != '_hashlib':
+            return f"Python is not using OpenSSL for {algorithm}; hashing may limit transfer speed, try blake2b"
+
+        try:
+            with open('/proc/cpuinfo') as f:
+                cpuinfo = f.read()
+        except OSError:
+            return None
+        # x86 lists 'sha_ni' under flags, ARM lists 'sha2' under Features
+        for line in cpuinfo.splitlines():
+            key, _, value = line.partition(':')
+            if key.strip() in ('flags', 'Features'):
+                if not {'sha_ni', 'sha2'}.intersection(value.split()):
+                    return "CPU has no SHA extensions; hashing may limit transfer speed, try blake2b or blake3"
+                break
+    return None
+
+
+def calculate_file_hash(filepath):
+    """Calculate hash of file using algorithm set in config"""
+    hash_func = create_hasher()
 
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
-            hash_func.update(chunk)
+        # Python 3.11+ reads into a reusable buffer instead of allocating per chunk
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, lambda: hash_func).hexdigest()
+        buffer = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hash_func.update(view[:n])
     return hash_func.hexdigest()
 
 
+def hash_file_range(f, size, hasher, stop=None):
+    """Hash the first 'size' bytes of an open file with positional reads, leaving its
+    offset alone so another thread can send from it; returns the number of bytes hashed"""
+    fd = f.fileno()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    offset = 0
+    while offset < size and not (stop and stop.is_set()):
+        chunk = view[:min(HASH_CHUNK_SIZE, size - offset)]
+        if hasattr(os, 'preadv'):
+            n = os.preadv(fd, [chunk], offset)
+        else:  # e.g. macOS before Python 3.12
+            data = os.pread(fd, len(chunk), offset)
+            n = len(data)
+            chunk[:n] = data
+        if not n:
+            break
+        hasher.update(chunk[:n])
+        offset += n
+    return offset
+
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB')
+
+
 def format_size(size):
     """Convert a file size in bytes to a human-readable string"""
     if size <= 0:
         return "0 B"
-    
-    units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']
-    for unit in units:
-        if size < 1024:
-            return f"{size:.1f} {unit}"
-        size /= 1024
-    return f"{size:.1f} EB"
+
+    # Each unit is 2**10 of the previous one, so the bit length picks it directly
+    shift = min(max(0, (int(size).bit_length() - 1) // 10), len(SIZE_UNITS) - 1)
+    return f"{size / (1 << (shift * 10)):.1f} {SIZE_UNITS[shift]}"
 
 
 def collect_directory_files(dir_path):
     """Collect all files in directory with their info"""
     files_info = []
     total_size = 0
-    base_path = Path(dir_path)
-    
-    for file_path in base_path.rglob('*'):
-        if file_path.is_file():
-            rel_path = file_path.relative_to(base_path)
-            size = file_path.stat().st_size
-            files_info.append({
-                'path': str(rel_path),
-                'full_path': str(file_path),
-                'size': size
-            })
-            total_size += size
-    
+    # scandir entries carry type (and on Windows stat) data from the directory
+    # read, so the walk avoids a Path object and extra syscalls per file
+    pending = [(dir_path, "")]
+
+    while pending:
+        current_dir, rel_dir = pending.pop()
+        with os.scandir(current_dir) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, rel_path))
+                elif entry.is_file():
+                    size = entry.stat().st_size
+                    files_info.append({
+                        'path': rel_path,
+                        'full_path': entry.path,
+                        'size': size
+                    })
+                    total_size += size
+
     return files_info, total_size
 
 
 def clean_path(path):
-    """Clean up file path (remove quotes)"""
-    if path.startswith('"') and path.endswith('"'):
-        return path[1:-1]
-    return path
+    """Clean up file path (remove surrounding whitespace and drag-and-drop quotes)"""
+    return path.strip().strip('"').strip("'").strip()
 
 
 def ensure_directory(path):
     """Ensure directory exists"""
     os.makedirs(path, exist_ok=True)
+
+
+def open_output_file(path, size):
+    """Open a received file for writing, buffered so a payload arriving in many
+    small reads reaches the disk in a few large writes"""
+    # Larger files go through the receiver's writer thread, which already writes
+    # whole BUFFER_SIZE chunks; a Python buffer would only copy them first
+    if WRITE_BUFFERS > 1 and size > BUFFER_SIZE:
+        return open(path, 'wb', buffering=0)
+    # Sized to the file (within BUFFER_SIZE) so small files don't each allocate a full buffer
+    return open(path, 'wb', buffering=min(max(size, io.DEFAULT_BUFFER_SIZE), BUFFER_SIZE))
+
+
+def preallocate_file(f, size):
+    """Reserve disk space for an open output file so it is written into contiguous extents"""
+    # A file that arrives in one buffer is written with one call and
+    # allocated in one go anyway, so the extra system call would be wasted
+    if size <= BUFFER_SIZE:
+        return
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            # Windows: extending the file up front at least avoids growing it per write
+            f.truncate(size)
+    except OSError as e:
+        # Running out of space is worth failing early for; anything else
+        # (e.g. a filesystem without fallocate support) just skips it
+        if e.errno == errno.ENOSPC:
+            raise
+
+
+def advise_sequential_read(f):
+    """Ask the kernel for a larger readahead window on a file read once, start to end"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def drop_cached_pages(f):
+    """Tell the kernel a file's cached pages will not be read again, so they are
+    reclaimed before pages other programs still use"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass